@@ -18,9 +18,24 @@ import os
 import re
 import time
 import json
+import random
+import queue
+import logging
+import sqlite3
+import hashlib
 import threading
 import tkinter as tk
+from collections import OrderedDict, deque
+from functools import lru_cache
+from pathlib import Path
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import requests
+from requests.adapters import HTTPAdapter
+try:
+    import orjson                             # Optional: much faster JSON parsing
+except ImportError:
+    orjson = None
 from tkinter import (
     Tk, Button, Label, Entry, StringVar, filedialog,
     messagebox, Toplevel, Frame, Text, Scrollbar
@@ -32,58 +47,105 @@ from tkinter import ttk
 # CONSTANTS
 # ========================================
 MODEL = "grok-4-fast-reasoning"               # xAI model used for translation
-MAX_BATCH_SIZE = 15                           # How many lines/values are sent in one API request
+MAX_BATCH_SIZE = 15                           # How many lines/values are sent in one API request (until measured)
+MIN_ADAPTIVE_BATCH, MAX_ADAPTIVE_BATCH = 4, 60  # Limits for the measured (adaptive) batch size
+MAX_OUT_TOKENS = 1500                         # max_tokens for one API response
+TOKEN_BUDGET = 1200                           # Estimated input tokens packed into one API request
+MAX_WORKERS = 8                               # How many API requests may be in flight at the same time
+MAX_RETRIES = 2                               # Retries per batch after the first attempt (retryable errors only)
+BASE_BACKOFF = 1.0                            # Seconds before the first retry; doubles on every retry
 MAX_FILE_SIZE = 5 * 1024 * 1024               # 5 MB limit – prevents huge memory/API issues
 API_URL = "https://api.x.ai/v1/chat/completions"
 KEY_FILE = "api_key.txt"                      # File where the xAI API key is stored
 LOG_FILE = "translation_log.txt"              # Persistent log file on disk
+LOG_FLUSH_MS = 250                            # Queued log lines reach the log window in one batch per interval
+LEVEL_COLORS = {                              # Log window text color per log level
+    "info": "#888888",
+    "success": "#00ff00",
+    "error": "#ff4444",
+    "progress": "#1f8cff"
+}
+TM_FILE = "tm_cache.sqlite"                   # On-disk translation memory (reused across files and runs)
+TM_TTL = 90 * 24 * 60 * 60                    # Translation memory entries older than 90 days are swept at startup
+TM_MAX_ENTRIES = 200_000                      # Oldest translation memory entries beyond this are swept at startup
+MEMO_SIZE = 50_000                            # Max translations kept in the in-process memo (LRU)
 
 
 # ========================================
 # SRT UTILITIES
 # ========================================
-def parse_srt(lines):
+def iter_srt_lines(lines):
     """
-    Parse raw lines from a .srt file into a list of subtitle dictionaries.
+    Generator that turns raw .srt lines (a list or an open file) into subtitle
+    dictionaries, one at a time – the lines are never collected into a list.
     
     Each dictionary contains:
         - num: subtitle number
         - time: timestamp line (e.g. 00:00:10,500 --> 00:00:12,000)
         - text: the actual subtitle text (joined with \n if multi-line)
     """
-    subtitles = []
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        if line.isdigit():                    # Subtitle index
-            num = int(line)
-            i += 1
-            if i >= len(lines):
+    stripped = (line.strip() for line in lines)   # Every line is stripped exactly once
+    for line in stripped:
+        if not line.isdecimal():              # Not a subtitle index (same digits as \d+)
+            continue
+        num = int(line)
+        timestamp = next(stripped, None)      # Timestamp line
+        if timestamp is None:
+            break
+        text_lines = []
+        for text in stripped:                 # Also consumes the empty separator line
+            if not text:
                 break
-            timestamp = lines[i].strip()       # Timestamp line
-            i += 1
-            text_lines = []
-            while i < len(lines) and lines[i].strip() != "":
-                text_lines.append(lines[i].strip())
-                i += 1
-            i += 1                            # Skip empty line separating subtitles
-            subtitles.append({
-                "num": num,
-                "time": timestamp,
-                "text": "\n".join(text_lines)
-            })
-        else:
-            i += 1
-    return subtitles
+            text_lines.append(text)
+        yield {
+            "num": num,
+            "time": timestamp,
+            "text": "\n".join(text_lines)
+        }
+
+
+def parse_srt(lines):
+    """Parse raw lines from a .srt file into a list of subtitle dictionaries."""
+    return list(iter_srt_lines(lines))
 
 
-def chunk_subtitles(subs, size):
+def iter_srt(path):
     """
-    Generator that yields chunks of subtitles (or JSON values) of maximum `size`.
-    Used for batch processing to stay under API limits.
+    Stream subtitles straight from the .srt file at `path`.
+    A UTF-8 BOM is dropped so the first index parses.
+    Raises ValueError for files larger than MAX_FILE_SIZE.
+    """
+    if os.path.getsize(path) > MAX_FILE_SIZE:
+        raise ValueError(f"File too big: {os.path.basename(path)}")
+    with open(path, "r", encoding="utf-8-sig") as f:
+        yield from iter_srt_lines(f)
+
+
+def pack_chunks(text_lists, size, budget=TOKEN_BUDGET):
+    """
+    Generator that packs the texts of one or more files into requests of at most `size`
+    texts and about `budget` input tokens (estimated as len(text) // 4).
+    Small files queued together share requests instead of sending one each.
+
+    Each packed chunk is a list of lightweight (texts, start, end) views – one per file
+    it touches – no list slice is copied.
     """
-    for i in range(0, len(subs), size):
-        yield subs[i:i + size]
+    chunk, count, tokens = [], 0, 0
+    for texts in text_lists:
+        start = 0
+        for i, text in enumerate(texts):
+            cost = len(text) // 4 + 1
+            if count == size or (count and tokens + cost > budget):
+                if i > start:
+                    chunk.append((texts, start, i))
+                yield chunk
+                chunk, count, tokens, start = [], 0, 0, i
+            count += 1
+            tokens += cost
+        if len(texts) > start:
+            chunk.append((texts, start, len(texts)))
+    if chunk:
+        yield chunk
 
 
 def save_srt(subtitles, path):
@@ -91,46 +153,97 @@ def save_srt(subtitles, path):
     Save a list of translated subtitle dictionaries back to a proper .srt file.
     The key 'translated' is used as the text content.
     """
-    with open(path, "w", encoding="utf-8") as f:
-        for sub in subtitles:
-            f.write(f"{sub['num']}\n{sub['time']}\n{sub['translated']}\n\n")
+    with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:   # 1 MiB buffer
+        f.writelines(f"{sub['num']}\n{sub['time']}\n{sub['translated']}\n\n" for sub in subtitles)
 
 
 # ========================================
 # JSON UTILITIES
 # ========================================
+_KV_RE = re.compile(r'"([^"]+)"\s*:\s*"([^"]*)"')   # "key" : "value" (allows spaces around colon)
+
+
+def iter_json_strings(node, path=()):
+    """
+    Recursively walk parsed JSON and yield (path, value) for every string leaf.
+    `path` is a tuple of dict keys / list indexes leading to the value.
+    """
+    if isinstance(node, dict):
+        for key, value in node.items():
+            yield from iter_json_strings(value, path + (key,))
+    elif isinstance(node, list):
+        for index, value in enumerate(node):
+            yield from iter_json_strings(value, path + (index,))
+    elif isinstance(node, str) and path:
+        yield path, node
+
+
+def json_loads(text):
+    """Parse JSON with orjson when installed; anything it rejects goes through the stdlib."""
+    if orjson:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
+
 def parse_json_text(file_path):
     """
     Extract keys and values from a .json localization file.
     
     Returns:
-        keys               – list of all keys (as strings)
+        keys               – list of paths to every string value (tuples of keys/indexes)
         values             – list of corresponding values to be translated
-        original_content   – full original file content (for preserving formatting/comments)
-    
-    Only simple "key" : "value" pairs are processed. Complex structures are ignored.
+        original_content   – the parsed JSON data
+
+    Files that are not strict JSON (e.g. with comments) fall back to a regex scan:
+    then keys are plain strings, only simple "key" : "value" pairs are processed and
+    original_content is the raw file text (for preserving formatting/comments).
+    A UTF-8 BOM (common in files saved on Windows) is dropped so strict JSON still parses.
     """
-    with open(file_path, "r", encoding="utf-8") as f:
+    with open(file_path, "r", encoding="utf-8-sig") as f:
         content = f.read()
 
-    # Matches "key" : "value" (allows spaces around colon)
-    pattern = r'"([^"]+)"\s*:\s*"([^"]*)"'
-    matches = re.findall(pattern, content)
+    try:
+        data = json_loads(content)
+    except json.JSONDecodeError:
+        matches = _KV_RE.findall(content)
+
+        keys = [m[0] for m in matches]
+        values = [m[1] for m in matches]
 
-    keys = [m[0] for m in matches]
-    values = [m[1] for m in matches]
+        return keys, values, content
 
-    return keys, values, content
+    pairs = list(iter_json_strings(data))
+    keys = [path for path, _ in pairs]
+    values = [value for _, value in pairs]
+    return keys, values, data
 
 
 def save_json(keys, translated_values, original_content, output_path):
     """
-    Replace only the values in the original JSON file while keeping:
-        - formatting
-        - comments
-        - order
-        - everything else untouched
+    Write the translated values back into the JSON structure, keeping key order
+    and everything that is not a string untouched. `original_content` is updated
+    in place.
+
+    For the regex fallback (raw text), replace only the values in the original file
+    while keeping formatting and comments.
     """
+    if not isinstance(original_content, str):
+        for path, value in zip(keys, translated_values):
+            node = original_content
+            for part in path[:-1]:
+                node = node[part]
+            node[path[-1]] = value
+
+        with open(output_path, "w", encoding="utf-8") as f:
+            # Always the stdlib: orjson formats floats differently (1e-7 vs 1e-07), and the
+            # output should not depend on whether orjson is installed
+            json.dump(original_content, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        return
+
     translation_map = dict(zip(keys, translated_values))
 
     def replacer(match):
@@ -138,15 +251,216 @@ def save_json(keys, translated_values, original_content, output_path):
         new_value = translation_map.get(key, match.group(2))
         return f'"{key}" : "{new_value}"'
 
-    new_content = re.sub(r'"([^"]+)"\s*:\s*"([^"]*)"', replacer, original_content)
+    new_content = _KV_RE.sub(replacer, original_content)
 
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(new_content)
 
 
+# ========================================
+# TEXT FILTERS
+# ========================================
+# Values that never need translating: empty/whitespace, only digits/punctuation/symbols,
+# URLs and bare format tokens such as {0}, {name}, %s, %d
+_SKIP_RE = re.compile(r'^\s*$|^[\W\d_]+$|^https?://\S+$|^\{[^}]+\}$|^%[sd]$')
+
+
+def needs_translation(text):
+    """False for strings that are passed through unchanged instead of sent to the API."""
+    return not _SKIP_RE.match(text)
+
+
+# ========================================
+# TRANSLATION MEMORY
+# ========================================
+def tm_key(text, lang):
+    """
+    16-byte BLAKE2b digest of (lang, text) – a small fixed-size key for the memo
+    and the translation memory, however long the text is.
+    """
+    return hashlib.blake2b(lang.encode("utf-8") + b"\0" + text.encode("utf-8"), digest_size=16).digest()
+
+
+class TranslationCache:
+    """
+    Persistent translation memory stored in a small SQLite database.
+
+    Every successful translation is saved under tm_key(text, lang), so a line
+    that was already translated (in this file, another file or a previous run)
+    is never sent to the API again. New entries are kept in memory until flush()
+    (once per file), so chunks do not each pay for a disk commit.
+    """
+
+    def __init__(self, path=TM_FILE, ttl=TM_TTL, max_entries=TM_MAX_ENTRIES):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()       # Connection is shared with the worker threads
+        self.pending = {}                  # tm_key -> translation, not yet written to disk
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS tm (hash BLOB PRIMARY KEY, tgt TEXT, ts INTEGER)"
+            )
+        self.sweep(ttl, max_entries)
+
+    def sweep(self, ttl, max_entries):
+        """Delete entries older than `ttl` seconds, then the oldest ones beyond `max_entries`."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM tm WHERE ts < ?", (int(time.time()) - ttl,))
+            self.conn.execute(
+                "DELETE FROM tm WHERE hash IN "
+                "(SELECT hash FROM tm ORDER BY ts DESC LIMIT -1 OFFSET ?)", (max_entries,)
+            )
+
+    def lookup(self, texts, lang, start=0, end=None):
+        """Return {index: translation} for every text in texts[start:end] already in memory."""
+        hits = {}
+        with self.lock:
+            for i in range(start, len(texts) if end is None else end):
+                key = tm_key(texts[i], lang)
+                if key in self.pending:
+                    hits[i] = self.pending[key]
+                    continue
+                row = self.conn.execute("SELECT tgt FROM tm WHERE hash=?", (key,)).fetchone()
+                if row:
+                    hits[i] = row[0]
+        return hits
+
+    def store(self, pairs, lang):
+        """Remember (source, translation) pairs; they are written on the next flush()."""
+        with self.lock:
+            for src, tgt in pairs:
+                self.pending[tm_key(src, lang)] = tgt
+
+    def flush(self):
+        """Write all pending entries in a single transaction."""
+        with self.lock:
+            now = int(time.time())
+            rows = [(key, tgt, now) for key, tgt in self.pending.items()]
+            self.pending.clear()
+            if rows:
+                with self.conn:
+                    self.conn.executemany("INSERT OR REPLACE INTO tm VALUES (?, ?, ?)", rows)
+
+
+# ========================================
+# IN-PROCESS MEMO
+# ========================================
+_MEMO = OrderedDict()                         # tm_key(text, lang) -> translation, least recently used first
+_MEMO_LOCK = threading.Lock()
+
+
+def memo_get(texts, lang):
+    """Return {text: translation} for every text already translated in this session."""
+    found = {}
+    with _MEMO_LOCK:
+        for text in texts:
+            key = tm_key(text, lang)
+            if key in _MEMO:
+                _MEMO.move_to_end(key)
+                found[text] = _MEMO[key]
+    return found
+
+
+def memo_put(pairs, lang):
+    """Remember (text, translation) pairs, evicting the oldest entries beyond MEMO_SIZE."""
+    with _MEMO_LOCK:
+        for text, translation in pairs:
+            key = tm_key(text, lang)
+            _MEMO[key] = translation
+            _MEMO.move_to_end(key)
+        while len(_MEMO) > MEMO_SIZE:
+            _MEMO.popitem(last=False)
+
+
 # ========================================
 # API CALL
 # ========================================
+# One shared session: keeps the HTTPS connections to the API alive between batches
+# instead of paying a new TCP + TLS handshake for every request. There is a single
+# host, and never more sockets than concurrent workers – each one is reused.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS,
+                                       pool_block=True, max_retries=0))
+_SESSION.headers.update({"Content-Type": "application/json", "Accept-Encoding": "gzip, deflate"})
+
+
+# Moving average of recent responses, used to size the next batches
+_STATS = {"tokens_per_item": None}
+_STATS_LOCK = threading.Lock()
+EMA_ALPHA = 0.3
+
+
+def record_batch_stats(items, completion_tokens, truncated=False):
+    """Update the moving average after a successful request of `items` texts."""
+    per_item = completion_tokens / max(items, 1)
+    if truncated:
+        per_item *= 2                         # Response hit max_tokens – shrink batches faster
+    with _STATS_LOCK:
+        old = _STATS["tokens_per_item"]
+        _STATS["tokens_per_item"] = per_item if old is None else old + EMA_ALPHA * (per_item - old)
+
+
+def adaptive_batch_size():
+    """
+    Batch size that keeps responses at ~70% of MAX_OUT_TOKENS based on the average
+    output tokens per text so far. Short strings get big batches, long ones small.
+    """
+    with _STATS_LOCK:
+        per_item = _STATS["tokens_per_item"]
+    if per_item is None:
+        return MAX_BATCH_SIZE
+    size = int(0.7 * MAX_OUT_TOKENS / max(per_item, 20))
+    return max(MIN_ADAPTIVE_BATCH, min(size, MAX_ADAPTIVE_BATCH))
+
+
+@lru_cache(maxsize=8)
+def _system_msg(lang):
+    """System prompt for `lang` – built once per language, not once per batch."""
+    return {
+        "role": "system",
+        "content": (
+            f"Translate each numbered user message to {lang}. "
+            'Respond with a single JSON object {"t": [...]} containing the translations '
+            "in the same order, without the [n] numbers. No commentary."
+        )
+    }
+
+
+_ECHO_NUM_RE = re.compile(r"\[(\d+)\]\s*")        # "[n] " prefix the model may echo back
+
+
+def _strip_echoed_number(text, n):
+    """Drop a leading "[n] " from the n-th translation – only its own number, never other brackets."""
+    match = _ECHO_NUM_RE.match(text)
+    if match and int(match.group(1)) == n:
+        return text[match.end():]
+    return text
+
+
+def parse_translations(content):
+    """
+    Extract the list of translations from the model reply.
+
+    The expected reply is a JSON object {"t": [...]} (possibly wrapped in a code
+    fence). If the model drifts from that format, fall back to the old protocol
+    of translations separated by double newlines. Echoed [n] numbers are removed.
+    """
+    try:
+        data = json.loads(content[content.find("{"):content.rfind("}") + 1])
+        items = data["t"]
+        if not isinstance(items, list):
+            raise TypeError("\"t\" is not a list")
+        # Non-string items (null, numbers...) become "" – the original text is kept for them
+        items = [t.strip() if isinstance(t, str) else "" for t in items]
+    except (ValueError, KeyError, TypeError):
+        items = [t.strip() for t in content.split("\n\n") if t.strip()]
+    return [_strip_echoed_number(t, n) for n, t in enumerate(items, 1)]
+
+
+@lru_cache(maxsize=4)
+def _auth_headers(api_key):
+    """Per-request headers for `api_key` – built once per key, not once per batch."""
+    return {"Authorization": f"Bearer {api_key}"}
+
 
 def translate_batch(batch, lang, api_key, cancel_event=None):
 
@@ -172,20 +486,32 @@ def translate_batch(batch, lang, api_key, cancel_event=None):
 
         (translations_list, error_message) – error_message is None on success
 
+    Texts already translated in this session are answered from the memo, and
+    duplicates inside the batch are sent only once.
+
     """
 
-    messages = [
-        {"role": "system", "content": f"Translate to {lang}. Only translation, no explanations."}
-    ]
-    for item in batch:
-        messages.append({"role": "user", "content": item["text"]})
+    texts = [item["text"] for item in batch]
+    found = memo_get(texts, lang)
+    unique = list(dict.fromkeys(t for t in texts if t not in found))
+    if not unique:
+        return [found[t] for t in texts], None
+
+    messages = [_system_msg(lang)]
+    messages.extend([{"role": "user", "content": f"[{n}] {text}"} for n, text in enumerate(unique, 1)])
+
+    # Serialize once, compactly and without \uXXXX escapes (Content-Type is set on the session)
+    body = json.dumps(
+        {"model": MODEL, "messages": messages, "max_tokens": MAX_OUT_TOKENS, "temperature": 0.3},
+        ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
 
     try:
-        response = requests.post(
+        response = _SESSION.post(
             API_URL,
-            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json={"model": MODEL, "messages": messages, "max_tokens": 1500, "temperature": 0.3},
-            timeout=30
+            headers=_auth_headers(api_key),
+            data=body,
+            timeout=(3.05, 27)                # (connect, read) – 30 s in total
         )
 
         if cancel_event and cancel_event.is_set():
@@ -198,25 +524,79 @@ def translate_batch(batch, lang, api_key, cancel_event=None):
             return None, "Rate limit!"
         if response.status_code == 402: 
             return None, "No credits!"
+        if response.status_code in (500, 502, 503, 504):
+            return None, f"Server error {response.status_code}"
 
         response.raise_for_status()
-        content = response.json()["choices"][0]["message"]["content"].strip()
-        # Grok returns translations separated by double newlines
-        translations = [t.strip() for t in content.split("\n\n") if t.strip()]
+        try:
+            payload = orjson.loads(response.content) if orjson else response.json()
+            choice = payload["choices"][0]
+            content = choice["message"]["content"].strip()
+            completion_tokens = (payload.get("usage") or {}).get("completion_tokens", 0)
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            # Not JSON (e.g. an HTML error page) or no usable choices in it
+            return None, f"Bad reply: {type(e).__name__}"
+        translations = parse_translations(content)
+        record_batch_stats(
+            len(unique),
+            completion_tokens,
+            truncated=choice.get("finish_reason") == "length"
+        )
 
-        expected = len(batch)
-        if len(translations) < expected:
-            translations.extend([""] * (expected - len(translations)))
+        # A count mismatch means the translations cannot be aligned – retry instead of guessing
+        expected = len(unique)
+        if len(translations) != expected:
+            return None, f"Incomplete reply: {len(translations)} of {expected} translations"
 
-        return translations[:expected], None
+        fresh = [(text, t) for text, t in zip(unique, translations) if t]
+        memo_put(fresh, lang)
+        found.update(fresh)
+        return [found.get(t, "") for t in texts], None
 
     except requests.exceptions.Timeout:
         return None, "Timeout (30s)"
+    except requests.exceptions.ConnectionError as e:
+        if cancel_event and cancel_event.is_set():
+            return None, "Canceled"
+        return None, f"Connection error: {str(e)[:60]}"
     except requests.exceptions.RequestException as e:
         if cancel_event and cancel_event.is_set():
             return None, "Canceled"
         return None, f"Error: {str(e)[:80]}"
 
+# Errors worth another attempt: 429, 5xx, network problems, malformed and unaligned replies.
+# Anything else (invalid key, no credits, other 4xx) fails the batch immediately.
+RETRYABLE_ERRORS = ("Rate limit!", "Server error", "Timeout", "Connection error", "Bad reply", "Incomplete reply")
+
+
+def backoff_delay(attempt):
+    """Exponential back-off with a little jitter so parallel workers do not retry in lockstep."""
+    return BASE_BACKOFF * 2 ** attempt + random.random() * 0.2
+
+
+# ========================================
+# FILE LOGGING
+# ========================================
+def setup_file_logger(path):
+    """
+    Create the "translator" logger whose records are written to `path` by a
+    background QueueListener thread, so callers only pay for a queue put.
+
+    Returns (logger, listener) – call listener.stop() on exit to flush the queue.
+    """
+    log_queue = queue.SimpleQueue()
+    handler = logging.FileHandler(path, encoding="utf-8", delay=True)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+
+    logger = logging.getLogger("translator")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.handlers[:] = [QueueHandler(log_queue)]
+    return logger, listener
+
+
 # ========================================
 # MAIN GUI CLASS
 # ========================================
@@ -230,19 +610,25 @@ class UltraTranslator:
         # ------------------- Application state -------------------
         self.file_path = None           # Kept for backward compatibility (single-file mode remnants)
         self.file_paths = []            # List of selected files (supports multiple)
+        self.file_meta = []             # (path, size, ext, name) per selected file, computed once
         self.api_key = self.load_key()
         self.dark_mode = True
         self.total_subs = 0
         self.translated_count = 0
         self.cancel_event = None
         self.translation_thread = None
+        self._current_original_json = None  # Parsed JSON of the file being finished (reused on cancel)
 
         # ------------------- Logging -------------------
-        self.log_buffer = []            # In-memory buffer (not used directly now)
+        self._log_q = deque()           # Lines waiting for the log window (inserted in batches)
+        self._log_lock = threading.Lock()
+        self._log_flush_pending = False # True while a _flush_log call is scheduled
         self.log_file = LOG_FILE
         self.log_win = None             # Toplevel log window
         self.log_widget = None          # Text widget inside the log window
         self._log_sync_id = None        # ID of the <Configure> binding for docking
+        self._sync_pending = False      # True while a _do_sync call is scheduled
+        self._resize_pending = False    # True while an update_window_size call is scheduled
 
         # Clean old log file at startup
         if os.path.exists(self.log_file):
@@ -250,9 +636,17 @@ class UltraTranslator:
                 os.remove(self.log_file)
             except:
                 pass
+        self.file_logger, self.log_listener = setup_file_logger(self.log_file)
+
+        # ------------------- Translation memory -------------------
+        try:
+            self.tm = TranslationCache()
+        except sqlite3.Error:
+            self.tm = None              # Translation still works, just without the cache
 
         self.setup_ui()
         self.apply_theme()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     # ====================================
     # UI SETUP
@@ -262,7 +656,8 @@ class UltraTranslator:
         # Header with title and theme toggle
         self.header = Frame(self.root, bg="#1e1e1e" if self.dark_mode else "#e0e0e0")
         self.header.pack(fill="x")
-        Frame(self.header, bg=self.header["bg"]).pack(side="left", padx=10)
+        self.header_spacer = Frame(self.header, bg=self.header["bg"])
+        self.header_spacer.pack(side="left", padx=10)
         self.title = Label(self.header, text="The Translator", font=("Segoe UI", 14, "bold"),
                            fg="#1f8cff", bg=self.header["bg"])
         self.title.pack(side="left", fill="x", expand=True)
@@ -289,13 +684,15 @@ class UltraTranslator:
         self.file_lang_frame.columnconfigure(0, weight=1)
         self.file_lang_frame.columnconfigure(1, weight=1)
 
-        Button(self.file_lang_frame, text="Select Files", bg="#4CAF50", fg="white",
-               command=self.select_files).grid(row=0, column=0, padx=(0, 10), sticky="w")
+        select_btn = Button(self.file_lang_frame, text="Select Files", bg="#4CAF50", fg="white",
+                            command=self.select_files)
+        select_btn.grid(row=0, column=0, padx=(0, 10), sticky="w")
 
         lang_inner = Frame(self.file_lang_frame, bg=self.main_frame["bg"])
         lang_inner.grid(row=0, column=1, sticky="e")
-        Label(lang_inner, text="Language:", fg="#bbbbbb" if self.dark_mode else "#555555",
-              bg=self.main_frame["bg"]).pack(side="left")
+        lang_label = Label(lang_inner, text="Language:", fg="#bbbbbb" if self.dark_mode else "#555555",
+                           bg=self.main_frame["bg"])
+        lang_label.pack(side="left")
         self.lang_var = StringVar(value="Bulgarian")
         ttk.Combobox(lang_inner, textvariable=self.lang_var,
                      values=["Bulgarian", "English", "Spanish", "French", "German"],
@@ -329,6 +726,11 @@ class UltraTranslator:
 
         self.main_frame.grid_columnconfigure(0, weight=1)
 
+        # Widgets recolored by apply_theme (no winfo_children() walks on every toggle)
+        self._themed_frames = [self.main_frame, self.progress_frame, self.file_lang_frame, lang_inner]
+        self._themed_labels = [lang_label]
+        self._themed_buttons = [select_btn]
+
     # ====================================
     # THEME & UTILITIES
     # ====================================
@@ -340,27 +742,20 @@ class UltraTranslator:
         text_fg = "#bbbbbb" if self.dark_mode else "#555555"
 
         self.root.configure(bg=bg)
-        self.main_frame.configure(bg=bg)
-        self.progress_frame.configure(bg=bg)
+        for frame in self._themed_frames:
+            frame.configure(bg=bg)
         self.header.configure(bg=header_bg)
         self.title.configure(bg=header_bg, fg="#1f8cff")
-        self.header.winfo_children()[0].configure(bg=header_bg)
+        self.header_spacer.configure(bg=header_bg)
 
         self.toggle_btn.configure(text="🌙" if self.dark_mode else "☀️",
                                   bg=btn_bg, fg="white" if self.dark_mode else "black")
         self.api_btn.configure(bg=btn_bg, fg="white" if self.dark_mode else "black")
 
-        self.file_lang_frame.configure(bg=bg)
-        for child in self.file_lang_frame.winfo_children():
-            if isinstance(child, Frame):
-                child.configure(bg=bg)
-                for subchild in child.winfo_children():
-                    if isinstance(subchild, Label):
-                        subchild.configure(bg=bg, fg=text_fg)
-                    elif isinstance(subchild, Button):
-                        subchild.configure(bg="#4CAF50", fg="white")
-            elif isinstance(child, Button):
-                child.configure(bg="#4CAF50", fg="white")
+        for label in self._themed_labels:
+            label.configure(bg=bg, fg=text_fg)
+        for button in self._themed_buttons:
+            button.configure(bg="#4CAF50", fg="white")
 
         self.file_label.configure(bg=bg, fg="#888888" if self.dark_mode else "#666666")
         self.status.configure(bg=bg)
@@ -372,20 +767,30 @@ class UltraTranslator:
             self.log_widget.configure(bg=log_bg,
                                       fg="#00ff00" if self.dark_mode else "#000000")
 
+        self.root.update_idletasks()              # Repaint once, after every widget is recolored
+
     def toggle_theme(self):
         """Switch between dark and light mode."""
         self.dark_mode = not self.dark_mode
         self.apply_theme()
 
+    def _schedule_resize(self):
+        """Queue one update_window_size call; requests made while it is pending are merged."""
+        if self._resize_pending:
+            return
+        self._resize_pending = True
+        self.root.after(10, self.update_window_size)
+
     def update_window_size(self):
         """Resize main window dynamically based on content (with reasonable limits)."""
+        self._resize_pending = False
         self.root.update_idletasks()
         req_w, req_h = self.root.winfo_reqwidth(), self.root.winfo_reqheight()
         new_w = max(275, min(req_w, 900))
         new_h = max(300, min(req_h, 700))
-        current = f"{self.root.winfo_width()}x{self.root.winfo_height()}"
-        if current != f"{new_w}x{new_h}":
-            self.root.geometry(f"{new_w}x{new_h}")
+        if (self.root.winfo_width(), self.root.winfo_height()) == (new_w, new_h):
+            return                                # Already the right size – no geometry change
+        self.root.geometry(f"{new_w}x{new_h}")
 
     # ====================================
     # FILE & API KEY HANDLING
@@ -491,21 +896,30 @@ class UltraTranslator:
         if not paths:
             return
 
-        valid_paths = []
-        for path in paths:
-            if os.path.getsize(path) <= MAX_FILE_SIZE:
-                valid_paths.append(path)
+        if len(paths) > 10:
+            # Many files (e.g. on a network drive): overlap the stat calls
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+                sizes = [st.st_size for st in pool.map(os.stat, paths)]
+        else:
+            sizes = [os.stat(path).st_size for path in paths]
+
+        valid_meta = []
+        for path, size in zip(paths, sizes):
+            name = os.path.basename(path)
+            if size <= MAX_FILE_SIZE:
+                valid_meta.append((path, size, os.path.splitext(name)[1].lower(), name))
             else:
-                self.log(f"Skipped (too big): {os.path.basename(path)}", "error")
+                self.log(f"Skipped (too big): {name}", "error")
 
-        if not valid_paths:
+        if not valid_meta:
             messagebox.showerror("Error", "No valid files selected!")
             return
 
-        self.file_paths = valid_paths
-        self.file_label.config(text=f"{len(valid_paths)} files selected")
+        self.file_meta = valid_meta
+        self.file_paths = [meta[0] for meta in valid_meta]
+        self.file_label.config(text=f"{len(valid_meta)} files selected")
         self.check_ready()
-        self.update_window_size()
+        self._schedule_resize()
 
     def check_ready(self):
         """Enable the Translate button only when files are selected and a valid API key exists."""
@@ -520,30 +934,33 @@ class UltraTranslator:
     # ====================================
     def log(self, msg, level="info"):
         """
-        Write a message to disk log + in-memory buffer + live log window (if open).
+        Write a message to disk log + live log window (if open).
         
         Levels: info, success, error, progress
         """
         timestamp = time.strftime('%H:%M:%S')
         line = f"[{timestamp}] {msg}\n"
-        self.log_buffer.append((msg, level))
-        try:
-            with open(self.log_file, "a", encoding="utf-8") as f:
-                f.write(line)
-        except:
-            pass
+        self.file_logger.info(line.rstrip("\n"))     # Written to disk by the listener thread
+
+        # Worker threads only queue the line; the Tk thread inserts a whole batch at once
+        with self._log_lock:
+            self._log_q.append((line, level))
+            if self._log_flush_pending:
+                return
+            self._log_flush_pending = True
+        self.root.after(LOG_FLUSH_MS, self._flush_log)
 
-        if hasattr(self, 'log_widget') and self.log_widget and self.log_widget.winfo_exists():
+    def _flush_log(self):
+        """Insert every queued log line into the live log window with a single insert call."""
+        with self._log_lock:
+            batch = list(self._log_q)
+            self._log_q.clear()
+            self._log_flush_pending = False
+
+        if batch and self.log_widget and self.log_widget.winfo_exists():
             try:
-                color = {
-                    "info": "#888888",
-                    "success": "#00ff00",
-                    "error": "#ff4444",
-                    "progress": "#1f8cff"
-                }.get(level, "#ffffff")
-                self.log_widget.insert("end", line)
-                self.log_widget.tag_add(level, "end-2c", "end-1c")
-                self.log_widget.tag_config(level, foreground=color)
+                # Text.insert takes alternating text/tag arguments
+                self.log_widget.insert("end", *[part for entry in batch for part in entry])
                 self.log_widget.see("end")
             except:
                 pass
@@ -591,31 +1008,42 @@ class UltraTranslator:
         text.pack(side="left", fill="both", expand=True, padx=10, pady=10)
         scrollbar.pack(side="right", fill="y", pady=10)
         self.log_widget = text
-
+        for level, color in LEVEL_COLORS.items():
+            text.tag_config(level, foreground=color)
         # Load existing log file content
+        content = ""
         if os.path.exists(self.log_file):
             try:
                 with open(self.log_file, "r", encoding="utf-8") as f:
-                    text.insert("end", f.read())
+                    content = f.read()
+                text.insert("end", content)
             except:
-                text.insert("end", "[Log read error]\n")
+                text.insert("end", "[Log read error]\n", "error")
         else:
-            text.insert("end", "[No logs]\n")
+            text.insert("end", "[No logs]\n", "info")
+
+        # Queued lines are only partly in the file (the listener thread writes it in the
+        # background) – drained after the read, the written ones are a prefix of the queue
+        with self._log_lock:
+            queued = list(self._log_q)
+            self._log_q.clear()
+        written = len(queued)
+        while written and not content.endswith("".join(line for line, _ in queued[:written])):
+            written -= 1
+        if written < len(queued):
+            text.insert("end", *[part for entry in queued[written:] for part in entry])
         text.see("end")
         self.more_btn.config(text="Hide")
 
         def sync_position(event=None):
-            """Keep the log window glued to the right side of the main window."""
-            if self.log_win and self.log_win.winfo_exists():
-                mx = self.root.winfo_x()
-                my = self.root.winfo_y()
-                mw = self.root.winfo_width()
-                mh = self.root.winfo_height()
-                new_width = max(350, mw // 2)
-                self.log_win.geometry(f"{new_width}x{mh}+{mx + mw}+{my}")
+            """<Configure> fires for every pixel of a drag – only the last event of a burst moves the log window."""
+            if self._sync_pending:
+                return
+            self._sync_pending = True
+            self.root.after(30, self._do_sync)
 
         self._log_sync_id = self.root.bind("<Configure>", sync_position)
-        sync_position()
+        self._do_sync()
 
         def on_close():
             if self.log_win:
@@ -631,6 +1059,17 @@ class UltraTranslator:
         self.log_win.protocol("WM_DELETE_WINDOW", on_close)
         self.log_win.bind("<Escape>", lambda e: on_close())
 
+    def _do_sync(self):
+        """Keep the log window glued to the right side of the main window."""
+        self._sync_pending = False
+        if self.log_win and self.log_win.winfo_exists():
+            mx = self.root.winfo_x()
+            my = self.root.winfo_y()
+            mw = self.root.winfo_width()
+            mh = self.root.winfo_height()
+            new_width = max(350, mw // 2)
+            self.log_win.geometry(f"{new_width}x{mh}+{mx + mw}+{my}")
+
     # ====================================
     # TRANSLATION CONTROL & CANCEL
     # ====================================
@@ -655,185 +1094,350 @@ class UltraTranslator:
                 daemon=True
             )
             self.translation_thread.start()
-            self.root.after(10, self.update_window_size)
+            self._schedule_resize()
         else:
             # Cancel requested
             if self.cancel_event:
                 self.cancel_event.set()
+            _SESSION.close()                  # Drop pooled connections instead of reusing them
             self.translate_btn.config(state="disabled", text="CANCELING...")
             self.log("Cancel requested...", "info")
 
+    def on_close(self):
+        """
+        Closing the main window cancels a running translation first, so queued chunks
+        are dropped instead of keeping the process (and the API) busy after the window is gone.
+        """
+        if self.cancel_event:
+            self.cancel_event.set()
+        _SESSION.close()
+        self.root.destroy()
+
     def translate_queue(self, cancel_event):
         """
         Process all selected files one after another.
         This runs in a background thread.
+
+        All files share one pool of MAX_WORKERS request threads. Small files are
+        grouped so their texts share requests (see pack_chunks). As soon as the last
+        chunks of a group are in flight, the next group is parsed and queued, so the
+        tail of one group overlaps with the start of the next.
         """
+        lang = self.lang_var.get()
+        file_meta = list(self.file_meta)          # Fixed for this run, even if files are re-selected meanwhile
+        executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        next_group = None
         try:
-            for idx, file_path in enumerate(self.file_paths):
-                self.current_file_index = idx + 1
-                self.file_path = file_path
-                self.log(f"Processing: {os.path.basename(file_path)} ({idx+1}/{len(self.file_paths)})", "info")
-
-                # Determine total items in current file
-                ext = os.path.splitext(file_path)[1].lower()
-                if ext == ".srt":
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        lines = f.readlines()
-                    subs = parse_srt(lines)
-                    self.total_subs = len(subs)
-                elif ext == ".json":
-                    _, values, _ = parse_json_text(file_path)
-                    self.total_subs = len(values)
-                else:
+            idx = 0
+            while idx < len(file_meta):
+                group, next_group = next_group, None
+                if group is None or group["start"] != idx:
+                    group = self.prepare_group(file_meta, idx, lang, executor, cancel_event)
+                idx = group["end"]
+                for msg, level in group["messages"]:
+                    self.log(msg, level)
+
+                jobs = group["jobs"]
+                if not jobs:                      # Nothing to translate in this group
                     continue
-
-                if self.total_subs == 0:
-                    self.log("No text to translate. Skipping.", "info")
-                    continue
-
+                self.current_file_index = jobs[0]["index"]
+                self.file_path = jobs[0]["path"]
+                self.total_subs = group["total"]
                 self.translated_count = 0
                 self.root.after(0, lambda: self.status.config(text="0%"))
 
-                partial_data, success = self.translate_single_file(file_path, cancel_event)
-               
-                if cancel_event.is_set():
-                    self.root.after(0, lambda: self.reset_after_cancel(
-                        partial_data, "Canceled – partial saved!", file_path))
+                def prefetch(next_idx=idx):
+                    """Queue the next group once this one has no chunks left waiting."""
+                    nonlocal next_group
+                    if next_idx < len(file_meta) and not cancel_event.is_set():
+                        next_group = self.prepare_group(file_meta, next_idx, lang, executor, cancel_event)
+
+                results = self.collect_chunks(group, cancel_event, on_idle=prefetch)
+                self.flush_tm()
+
+                for job in jobs:
+                    self.file_path = job["path"]
+                    partial_data, success = self.finish_file(job, group["chunks"], results)
+                    if not success and cancel_event.is_set():
+                        self.root.after(0, lambda data=partial_data, path=job["path"], lang=job["lang"]:
+                                        self.reset_after_cancel(data, "Canceled – partial saved!", path, lang))
+                        return
+
+                    if not success:
+                        self.log(f"Failed: {job['name']}", "error")
+                    else:
+                        self.log(f"Completed: {job['name']}", "success")
+                if cancel_event.is_set():         # Canceled after the whole group was saved
                     return
-                
-                if not success:
-                    self.log(f"Failed: {os.path.basename(file_path)}", "error")
-                    continue
-                else:
-                    self.log(f"Completed: {os.path.basename(file_path)}", "success")
 
             self.root.after(0, lambda: messagebox.showinfo("Done", "All files processed!"))
 
         except Exception as e:
             self.log(f"Queue error: {e}", "error")
         finally:
+            if next_group:
+                for future in next_group["futures"]:
+                    future.cancel()
+            executor.shutdown(wait=False)         # Never block on requests still in flight
+            self.flush_tm()
             self.root.after(0, self.final_reset)
 
-    def translate_single_file(self, file_path, cancel_event):
+    def flush_tm(self):
+        """Persist new translation memory entries (once per file, not per chunk)."""
+        if self.tm:
+            try:
+                self.tm.flush()
+            except sqlite3.Error as e:
+                self.log(f"Translation memory not saved: {e}", "error")
+
+    def prepare_group(self, file_meta, start, lang, executor, cancel_event):
+        """
+        Parse the files of `file_meta` (the run's snapshot of self.file_meta) from position
+        `start` on until they fill at least one request, pack their texts into chunks and queue every chunk on `executor`.
+        A big file ends up alone in its group; small files share requests.
+
+        Returns a group dict for collect_chunks. Its log lines are kept in the group and
+        written when its turn comes, so a prefetched group does not log out of order.
+        """
+        size = adaptive_batch_size()
+        group = {"start": start, "jobs": [], "messages": [], "total": 0}
+        idx = start
+        while idx < len(file_meta) and group["total"] < size:
+            meta = file_meta[idx]
+            idx += 1
+            name = meta[3]
+            group["messages"].append((f"Processing: {name} ({idx}/{len(file_meta)})", "info"))
+            try:
+                job = self.prepare_file(meta, lang)
+            except Exception as e:
+                group["messages"].append((f"Error in file {name}: {e}", "error"))
+                group["messages"].append((f"Failed: {name}", "error"))
+                continue
+            if job is None:                       # Unsupported extension
+                continue
+            if job["total"] == 0:
+                group["messages"].append(("No text to translate. Skipping.", "info"))
+                continue
+            job["index"] = idx
+            group["jobs"].append(job)
+            group["total"] += job["total"]
+
+        group["end"] = idx
+        group["chunks"] = list(pack_chunks([job["texts"] for job in group["jobs"]], size))
+        group["futures"] = [executor.submit(self.translate_chunk, chunk, lang, cancel_event)
+                            for chunk in group["chunks"]]
+        return group
+
+    def prepare_file(self, meta, lang):
+        """
+        Parse one file (either .srt or .json) and collect the texts to translate.
+        `meta` is the file's (path, size, ext, name) entry from select_files.
+        Returns a job dict for prepare_group, or None for unsupported files.
+        """
+        file_path, _, ext, name = meta
+        if ext not in (".srt", ".json"):
+            return None
+        p = Path(file_path)
+        job = {"path": file_path, "ext": ext, "name": name, "lang": lang,
+               "out_path": str(p.with_name(f"{p.stem}_translated_{lang}{p.suffix}"))}
+        if ext == ".srt":
+            job["subs"] = list(iter_srt(file_path))
+            texts = [sub["text"] for sub in job["subs"]]
+        elif ext == ".json":
+            job["keys"], values, job["original"] = parse_json_text(file_path)
+            # The same string (e.g. "Save") is often the value of many keys –
+            # translate each distinct value once, then scatter it to all its keys
+            positions = {}
+            for i, value in enumerate(values):
+                positions.setdefault(value, []).append(i)
+            job["positions"] = positions
+            texts = list(positions)               # Progress counts distinct values
+
+        job["texts"] = texts
+        job["total"] = len(texts)
+        return job
+
+    def finish_file(self, job, chunks, results):
         """
-        Translate one file (either .srt or .json) with retries and progress updates.
-        Returns True on success, False on fatal error.
+        Pick the translations of one file out of its group's packed chunks and save
+        the translated file.
+        Returns (translated_data, success) – on cancel the data is the partial result
+        and nothing is saved.
         """
+        texts, out_path = job["texts"], job["out_path"]
         try:
-            ext = os.path.splitext(file_path)[1].lower()
-            if ext == ".srt":
-                with open(file_path, "r", encoding="utf-8") as f:
-                    lines = f.readlines()
-                subs = parse_srt(lines)
-                chunks = list(chunk_subtitles(subs, MAX_BATCH_SIZE))
-                translated = []
-
-                for chunk in chunks:
-                    if cancel_event.is_set():
-                        return translated, False
-
-                    result = None
-                    for attempt in range(2):
-                        if cancel_event.is_set():
-                            return translated, False
-                        result, error = translate_batch(
-                            [{"text": sub["text"]} for sub in chunk],
-                            self.lang_var.get(),
-                            self.api_key,
-                            cancel_event
-                        )
-                        if result:
-                            break
-                        self.log(f"Retry {attempt + 1}...", "error")
-                        time.sleep(1)
-                    if result is None:
-                        result = [sub["text"] for sub in chunk]  # Fallback to original
-
-                    for j, sub in enumerate(chunk):
-                        t = result[j].strip() or sub["text"]
-                        translated.append({"num": sub["num"], "time": sub["time"], "translated": t})
-
-                    self.translated_count += len(chunk)
-                    percent = int((self.translated_count / self.total_subs) * 100)
-                    self.root.after(0, lambda p=percent: self.smooth_progress(p))
-                    self.log(f"File {self.current_file_index}: {self.translated_count}/{self.total_subs}", "success")
+            spans = []                              # (start, end, translations) of this file
+            complete = True
+            for chunk, result in zip(chunks, results):
+                for s, (chunk_texts, start, end) in enumerate(chunk):
+                    if chunk_texts is not texts:    # Part of another file in the group
+                        continue
+                    if result is None:              # Not finished because of cancel
+                        complete = False
+                    else:
+                        spans.append((start, end, result[s]))
+
+            if job["ext"] == ".srt":
+                subs = job["subs"]
+                translated = [None] * len(subs)     # Filled by absolute index, in any chunk order
+                for start, end, result in spans:
+                    for k, t in zip(range(start, end), result):
+                        translated[k] = {"num": subs[k]["num"], "time": subs[k]["time"], "translated": t}
+                if not complete:
+                    return [sub for sub in translated if sub is not None], False
 
-                out_path = file_path.replace(".srt", f"_translated_{self.lang_var.get()}.srt")
                 save_srt(translated, out_path)
                 self.log(f"Saved: {os.path.basename(out_path)}", "success")
                 return translated, True
 
-            elif ext == ".json":
-                keys, values, original_content = parse_json_text(file_path)
-                if not values:
-                    return [],True
-
-                chunks = [values[i:i + MAX_BATCH_SIZE] for i in range(0, len(values), MAX_BATCH_SIZE)]
-                translated_pairs = []
-
-                for i, chunk in enumerate(chunks):
-                    if cancel_event.is_set():
-                        return translated_pairs, False
-
-                    result = None
-                    for attempt in range(2):
-                        if cancel_event.is_set():
-                            return translated_pairs, False
-                        result, error = translate_batch(
-                            [{"text": v} for v in chunk],
-                            self.lang_var.get(),
-                            self.api_key,
-                            cancel_event
-                        )
-                        if result:
-                            break
-                        self.log(f"Retry {attempt + 1}...", "error")
-                        time.sleep(1)
-                    if result is None:
-                        result = chunk
-
-                    start_idx = i * MAX_BATCH_SIZE
-                    for j, translated_text in enumerate(result):
-                        orig_text = chunk[j]
-                        key = keys[start_idx + j]
-                        final_text = translated_text.strip() or orig_text
-                        translated_pairs.append((key, final_text))
-
-                    self.translated_count += len(chunk)
-                    percent = int((self.translated_count / self.total_subs) * 100)
-                    self.root.after(0, lambda p=percent: self.smooth_progress(p))
-                    self.log(f"File {self.current_file_index}: {self.translated_count}/{self.total_subs}", "success")
-
-                out_path = file_path.replace(".json", f"_translated_{self.lang_var.get()}.json")
-                save_json(keys, [text for _, text in translated_pairs], original_content, out_path)
+            else:
+                keys, positions = job["keys"], job["positions"]
+                self._current_original_json = job["original"]
+                translated_values = [None] * len(keys)
+                for start, end, result in spans:
+                    for k, t in zip(range(start, end), result):
+                        for i in positions[texts[k]]:
+                            translated_values[i] = t
+                translated_pairs = [(key, value) for key, value in zip(keys, translated_values) if value is not None]
+                if not complete:
+                    return translated_pairs, False
+
+                save_json(keys, translated_values, job["original"], out_path)
                 self.log(f"Saved: {os.path.basename(out_path)}", "success")
                 return translated_pairs, True
-            
-            return [], True
 
         except Exception as e:
-            self.log(f"Error in file {os.path.basename(file_path)}: {e}", "error")
+            self.log(f"Error in file {job['name']}: {e}", "error")
             return [], False
 
-    def reset_after_cancel(self, translated_data, msg, current_file_path=None):
+    def collect_chunks(self, group, cancel_event, on_idle=None):
+        """
+        Wait for the queued chunks of `group` and report progress as they finish.
+
+        Returns the translations of every chunk in submission order. Chunks that did
+        not finish because the translation was canceled are left as None; a chunk whose
+        worker raised keeps its original texts.
+        `on_idle` is called once, when none of the chunks is still waiting for a worker.
+        """
+        chunks, futures = group["chunks"], group["futures"]
+        index = {future: i for i, future in enumerate(futures)}
+        results = [None] * len(chunks)
+        pending = set(futures)
+        try:
+            while pending:
+                # Short ticks so a cancel is noticed within a fraction of a second,
+                # even while requests are still waiting for the server
+                done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = index[future]
+                    try:
+                        results[i] = future.result()
+                    except Exception as e:          # Unexpected worker error – fail this batch only
+                        self.log(f"Batch failed: {e}", "error")
+                        results[i] = [texts[start:end] for texts, start, end in chunks[i]]
+                    if results[i] is None:
+                        continue
+
+                    self.translated_count += sum(end - start for _, start, end in chunks[i])
+                    percent = int((self.translated_count / self.total_subs) * 100)
+                    self.root.after(0, self._set_progress, percent)
+                    self.log(f"File {self.current_file_index}: {self.translated_count}/{self.total_subs}", "success")
+                if cancel_event.is_set():
+                    break
+                if on_idle and all(f.running() or f.done() for f in pending):
+                    on_idle()
+                    on_idle = None
+        finally:
+            for future in pending:
+                future.cancel()             # Drop chunks that have not started yet
+        if on_idle and not cancel_event.is_set():
+            on_idle()                       # Every chunk finished before a worker was idle
+        return results
+
+    def translate_chunk(self, chunk, lang, cancel_event):
+        """
+        Translate one packed chunk (a list of (texts, start, end) views) as produced
+        by pack_chunks – all of its texts go out in a single request.
+
+        The translation memory is consulted first – only the misses are sent to the
+        API, each distinct text once (retrying with back-off), and fresh translations
+        are stored back in the memory.
+        Texts that need no translation (numbers, URLs, format tokens...) are kept as is.
+        Returns the translations of every view in the original order (falling back to
+        the original text on failure), or None if the translation was canceled.
+        """
+        hits, misses = [], {}                       # misses: text -> every (view, index) it appears at
+        for s, (texts, start, end) in enumerate(chunk):
+            view_hits = self.tm.lookup(texts, lang, start, end) if self.tm else {}
+            hits.append(view_hits)
+            for i in range(start, end):
+                if i not in view_hits and needs_translation(texts[i]):
+                    misses.setdefault(texts[i], []).append((s, i))
+
+        result = None
+        if misses:
+            for attempt in range(MAX_RETRIES + 1):
+                if cancel_event.is_set():
+                    return None
+                result, error = translate_batch(
+                    [{"text": text} for text in misses],
+                    lang,
+                    self.api_key,
+                    cancel_event
+                )
+                if result:
+                    break
+                if cancel_event.is_set():
+                    return None                   # Not a failure – nothing to log
+                if attempt == MAX_RETRIES or not error.startswith(RETRYABLE_ERRORS):
+                    self.log(f"Batch failed: {error}", "error")
+                    break
+                delay = backoff_delay(attempt)
+                self.log(f"Retry {attempt + 1} in {delay:.1f}s ({error})...", "error")
+                cancel_event.wait(delay)          # Other workers keep going; wakes up on cancel
+            if result is None and cancel_event.is_set():
+                return None
+
+        translations = [[view_hits.get(i, texts[i]) for i in range(start, end)]
+                        for view_hits, (texts, start, end) in zip(hits, chunk)]
+        if result is not None:
+            fresh = []
+            for (text, places), t in zip(misses.items(), result):
+                t = t.strip()
+                if t:
+                    for s, i in places:
+                        translations[s][i - chunk[s][1]] = t
+                    fresh.append((text, t))
+            if self.tm:
+                self.tm.store(fresh, lang)
+        return translations
+
+    def reset_after_cancel(self, translated_data, msg, current_file_path=None, lang=None):
         """
         When translation is cancelled, save whatever has been translated so far as a partial file.
+        `lang` is the language the run translated into (the combobox may have changed since).
         """
         if not current_file_path:
             current_file_path = self.file_path
+        if not lang:
+            lang = self.lang_var.get()
 
-        ext = os.path.splitext(current_file_path)[1].lower()
+        p = Path(current_file_path)
+        ext = p.suffix.lower()
+        partial_path = str(p.with_name(f"{p.stem}_partial_{lang}{p.suffix}"))
         out_path = ""
 
         if translated_data and ext:
             if ext == ".srt":
-                out_path = current_file_path.replace(".srt", f"_partial_{self.lang_var.get()}.srt")
+                out_path = partial_path
                 save_srt(translated_data, out_path)
             elif ext == ".json":
                 if translated_data:
                     partial_keys, partial_values = zip(*translated_data)
-                    content = parse_json_text(current_file_path)[2]
-                    out_path = current_file_path.replace(".json", f"_partial_{self.lang_var.get()}.json")
+                    content = self._current_original_json
+                    if content is None:
+                        content = parse_json_text(current_file_path)[2]
+                    out_path = partial_path
                     save_json(list(partial_keys), list(partial_values), content, out_path)
 
             if out_path:
@@ -846,32 +1450,23 @@ class UltraTranslator:
         self.translate_btn.config(text="TRANSLATE", bg="#00c853",
                                   state="normal" if self.file_paths and self.api_key else "disabled")
         self.progress_frame.grid_remove()
-        self.root.after(10, self.update_window_size)
+        self._schedule_resize()
 
     def hide_progress_and_reset(self):
         """Hide progress bar and reset button after completion/cancellation."""
         self.progress_frame.grid_remove()
         self.translate_btn.config(text="TRANSLATE", bg="#00c853",
                                   state="normal" if self.file_paths and self.api_key else "disabled")
-        self.root.after(10, self.update_window_size)
-
-    def smooth_progress(self, target_percent):
-        """Animate the progress bar smoothly towards the target percentage."""
-        current = self.progress["value"]
-        if current >= target_percent:
-            self.progress["value"] = target_percent
-            self.status.config(text=f"{target_percent}%")
-            return
+        self._schedule_resize()
 
-        step = max(1, (target_percent - current) // 8)
-        current += step
-        self.progress["value"] = current
-        self.status.config(text=f"{current}%")
-        if current < target_percent:
-            self.root.after(40, lambda: self.smooth_progress(target_percent))
+    def _set_progress(self, percent):
+        """Move the progress bar straight to `percent` (one update per finished chunk)."""
+        self.progress["value"] = percent
+        self.status.config(text=f"{percent}%")
 
     def final_reset(self):
         """Final UI cleanup after translation finishes or is cancelled."""
+        self._current_original_json = None
         self.progress["value"] = 100
         self.status.config(text="100%")
         self.translate_btn.config(
@@ -880,7 +1475,7 @@ class UltraTranslator:
             state="normal" if self.file_paths and self.api_key else "disabled"
         )
         self.progress_frame.grid_remove()
-        self.root.after(10, self.update_window_size)
+        self._schedule_resize()
         self.log("Translation finished or canceled.", "info")
 
 
@@ -890,4 +1485,6 @@ class UltraTranslator:
 if __name__ == "__main__":
     root = Tk()
     app = UltraTranslator(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.log_listener.stop()
+    _SESSION.close()
\ No newline at end of file